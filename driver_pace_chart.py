@@ -2,6 +2,8 @@ import plotly.express as px
 import pandas as pd
 import streamlit as st
 
+# Fragment: widget interactions rerun only this chart, not the whole page
+@st.fragment
 def show_driver_pace_chart(df, team_colors):
     # --- Independent Class selector ---
     available_classes = sorted(df['CLASS'].dropna().unique())
@@ -53,10 +55,8 @@ def show_driver_pace_chart(df, team_colors):
     def filter_top_percent_laps(df, percent):
         filtered_dfs = []
         for (car_number, driver), group in df.groupby(["NUMBER", "DRIVER_NAME"]):
-            group_sorted = group.sort_values("LAP_TIME_SECONDS")
-            n_laps = len(group_sorted)
-            n_keep = max(1, int(n_laps * percent / 100))
-            filtered_dfs.append(group_sorted.head(n_keep))
+            n_keep = max(1, int(len(group) * percent / 100))
+            filtered_dfs.append(group.nsmallest(n_keep, "LAP_TIME_SECONDS"))
         return pd.concat(filtered_dfs)
 
     filtered_df = filter_top_percent_laps(filtered_df, top_percent)
@@ -76,10 +76,11 @@ def show_driver_pace_chart(df, team_colors):
         return "#888888"
 
     avg_df["color"] = avg_df["TEAM"].apply(get_team_color)
+    # astype(str): DRIVER_NAME/TEAM are categorical, which doesn't support +
     avg_df["Label"] = (
-        avg_df["DRIVER_NAME"]
+        avg_df["DRIVER_NAME"].astype(str)
         + " — "
-        + avg_df["TEAM"]
+        + avg_df["TEAM"].astype(str)
         + " (#"
         + avg_df["NUMBER"].astype(str)
         + ")"
@@ -1,46 +1,55 @@
+import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
 import pandas as pd
 
-from race_preprocessing import preprocess_race
+from race_preprocessing import preprocess_race, get_race_arrays, RACE_DF_HASH_FUNCS
 
 
 # ------------------------------------------------------------
-# Cached aggregation helpers (unchanged)
+# Cached aggregation helper
 # ------------------------------------------------------------
 
-@st.cache_data(show_spinner=False)
-def get_sorted_driver_laps(pre_df: pd.DataFrame, driver: str) -> pd.DataFrame:
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
+def compute_percentile_averages(
+    pre_df: pd.DataFrame,
+    drivers: list,
+    percentiles: list,
+) -> dict:
     """
-    Cached sorted lap table for a single driver.
+    Average lap time of each driver's fastest N% laps, for every
+    driver/percentile pair, working on the typed NumPy arrays from
+    get_race_arrays (integer code compares, partial selection).
+    Returns {percentile: [avg per driver, in `drivers` order]}.
     """
-    return (
-        pre_df[pre_df["DRIVER_NAME"] == driver]
-        .sort_values("LAP_TIME_SECONDS")
-        .reset_index(drop=True)
-    )
+    arrays = get_race_arrays(pre_df)
+    lap_sec = arrays["LAP_TIME_SECONDS"]
+    codes = arrays["DRIVER_NAME_codes"]
+    categories = arrays["DRIVER_NAME_categories"]
 
+    result = {p: [] for p in percentiles}
 
-@st.cache_data(show_spinner=False)
-def compute_driver_percentile_average(
-    driver_laps: pd.DataFrame,
-    percentile: int,
-) -> float:
-    """
-    Cached percentile aggregation.
-    """
-    n_laps = len(driver_laps)
-    if n_laps == 0:
-        return None
+    for driver in drivers:
+        code = categories.get_loc(driver) if driver in categories else -1
+        laps = lap_sec[codes == code] if code >= 0 else np.empty(0)
 
-    n_keep = max(1, int(n_laps * percentile / 100))
-    return driver_laps.head(n_keep)["LAP_TIME_SECONDS"].mean()
+        for p in percentiles:
+            if len(laps) == 0:
+                result[p].append(None)
+                continue
+            # Fastest p% (always at least one lap), via partial selection
+            n_keep = max(1, int(len(laps) * p / 100))
+            result[p].append(np.partition(laps, n_keep - 1)[:n_keep].mean())
+
+    return result
 
 
 # ------------------------------------------------------------
 # Main chart
 # ------------------------------------------------------------
 
+# Fragment: widget interactions rerun only this chart, not the whole page
+@st.fragment
 def show_driver_pace_comparison(df, team_colors):
     st.markdown("## 🏁 Driver Pace Comparison by Top Lap Percentiles")
 
@@ -57,14 +66,17 @@ def show_driver_pace_comparison(df, team_colors):
         st.info("Please select at least one class.")
         return
 
+    # One groupby pass instead of a full-frame filter per class
+    drivers_by_class = (
+        df.dropna(subset=["DRIVER_NAME"])
+        .groupby("CLASS", observed=True)["DRIVER_NAME"]
+        .unique()
+        .to_dict()
+    )
+
     selected_drivers = []
     for race_class in selected_classes:
-        class_drivers = (
-            df[df["CLASS"] == race_class]["DRIVER_NAME"]
-            .dropna()
-            .unique()
-            .tolist()
-        )
+        class_drivers = list(drivers_by_class.get(race_class, []))
         chosen = st.multiselect(
             f"Select drivers from {race_class}",
             class_drivers,
@@ -106,21 +118,14 @@ def show_driver_pace_comparison(df, team_colors):
     # Aggregation (cached)
     # --------------------------------------------------------
 
-    data = []
-    y_values_all = []
-
-    for p in selected_percentiles:
-        avg_pace = []
-        for driver in selected_drivers:
-            driver_laps = get_sorted_driver_laps(pre_df, driver)
-            avg_time = compute_driver_percentile_average(
-                driver_laps, p
-            )
-            avg_pace.append(avg_time)
-            if avg_time is not None:
-                y_values_all.append(avg_time)
+    averages = compute_percentile_averages(
+        pre_df, selected_drivers, selected_percentiles
+    )
 
-        data.append((p, avg_pace))
+    data = [(p, averages[p]) for p in selected_percentiles]
+    y_values_all = [
+        t for (_, avg_pace) in data for t in avg_pace if t is not None
+    ]
 
     if not y_values_all:
         st.warning("No valid lap data available for selected drivers.")
@@ -1,7 +1,47 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import datetime
+
+# Cap on points shipped to the browser per trace
+MAX_TRACE_POINTS = 2000
+
+
+def downsample_lttb(x, y, n_out=MAX_TRACE_POINTS):
+    """
+    Largest-Triangle-Three-Buckets downsampling: keeps the ~n_out most
+    visually representative points of a trace. Returns (x, y) unchanged
+    when the trace is already small enough.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return x, y
+
+    buckets = np.array_split(np.arange(1, n - 1), n_out - 2)
+    keep = [0]
+    anchor = 0
+
+    for i, bucket in enumerate(buckets):
+        if i + 1 < len(buckets):
+            nxt = buckets[i + 1]
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        # Pick the point forming the largest triangle with the anchor and
+        # the next bucket's average
+        area = np.abs(
+            (x[anchor] - avg_x) * (y[bucket] - y[anchor])
+            - (x[anchor] - x[bucket]) * (avg_y - y[anchor])
+        )
+        anchor = bucket[np.nanargmax(area)] if np.any(~np.isnan(area)) else bucket[0]
+        keep.append(anchor)
+
+    keep.append(n - 1)
+    return x[keep], y[keep]
 
 # =========================
 # Helper: parse HOUR with rollover per car
@@ -12,32 +52,32 @@ def parse_hour_with_date_and_rollover(df: pd.DataFrame, race_start_date: datetim
     Converts 'HOUR' column (formatted hh:mm:ss.sss or hh:mm:ss) into absolute datetimes
     with rollover handling per car (grouped by 'NUMBER').
     """
-    def parse_time(val):
-        for fmt in ("%H:%M:%S.%f", "%H:%M:%S"):
-            try:
-                return datetime.strptime(val, fmt).time()
-            except Exception:
-                continue
-        return None
-
-    hour_dt = pd.Series(index=df.index, dtype="datetime64[ns]")
-
-    for car_id, car_df in df.sort_values("LAP_NUMBER").groupby("NUMBER"):
-        current_date = race_start_date
-        last_time = None
-
-        for idx, row in car_df.iterrows():
-            t = parse_time(row["HOUR"])
-            if t is None:
-                hour_dt.loc[idx] = pd.NaT
-                continue
-
-            # If current lap time is less than previous, day rollover
-            if last_time and t < last_time:
-                current_date += timedelta(days=1)
+    # Parse all HOUR strings at once (fractional seconds first; cache=True
+    # dedup-parses repeated strings), then retry only the misses plain
+    parsed = pd.to_datetime(df["HOUR"], format="%H:%M:%S.%f", errors="coerce", cache=True)
+    misses = parsed.isna()
+    if misses.any():
+        parsed.loc[misses] = pd.to_datetime(
+            df.loc[misses, "HOUR"], format="%H:%M:%S", errors="coerce", cache=True
+        )
+
+    # Time of day as offset from midnight
+    time_of_day = parsed - parsed.dt.normalize()
+
+    # Per-car day rollover: whenever the time of day decreases lap-over-lap,
+    # a new day has started — cumulative sum gives the day offset
+    order = df.sort_values("LAP_NUMBER").index
+    tod_sorted = time_of_day.loc[order]
+    rollover = (
+        (tod_sorted.groupby(df["NUMBER"].loc[order]).diff() < pd.Timedelta(0))
+        .groupby(df["NUMBER"].loc[order])
+        .cumsum()
+    )
+    day_offset = rollover.reindex(df.index)
 
-            last_time = t
-            hour_dt.loc[idx] = datetime.combine(current_date, t)
+    # Single base timestamp — all arithmetic stays in datetime64[ns]
+    base = pd.Timestamp(race_start_date)
+    hour_dt = base + pd.to_timedelta(day_offset, unit="D") + time_of_day
 
     return hour_dt
 
@@ -46,19 +86,23 @@ def parse_hour_with_date_and_rollover(df: pd.DataFrame, race_start_date: datetim
 # Helper: convert LAP_TIME string to seconds float
 # =========================
 
-def time_to_seconds(time_str):
-    try:
-        parts = str(time_str).split(':')
-        if len(parts) == 3:
-            h, m, s = parts
-            return int(h) * 3600 + int(m) * 60 + float(s)
-        elif len(parts) == 2:
-            m, s = parts
-            return int(m) * 60 + float(s)
-        else:
-            return float(time_str)
-    except:
-        return None
+def times_to_seconds(times: pd.Series) -> pd.Series:
+    """
+    Vectorized conversion of time strings ("h:mm:ss.sss", "m:ss.sss" or plain
+    seconds) to float seconds. Unparseable values become NaN.
+    """
+    # Strip first: the anchored regex would reject whitespace-padded values
+    as_str = times.astype(str).str.strip()
+    parts = as_str.str.extract(r"^(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)$")
+
+    seconds = (
+        pd.to_numeric(parts[0], errors="coerce").fillna(0) * 3600
+        + pd.to_numeric(parts[1], errors="coerce") * 60
+        + pd.to_numeric(parts[2], errors="coerce")
+    )
+
+    # Values without a colon are treated as plain seconds
+    return seconds.combine_first(pd.to_numeric(as_str, errors="coerce"))
 
 
 # =========================
@@ -71,16 +115,14 @@ def get_filtered_race_data(df, race_start_date):
         st.warning(f"Required columns missing: {required_cols - set(df.columns)}")
         return None, None, None, None
 
-    df = df.copy()
-
-    # Parse HOUR into absolute datetime per car with rollover
-    df['HOUR_DT'] = parse_hour_with_date_and_rollover(df, race_start_date)
-
-    # Convert LAP_TIME to seconds
-    df['LAP_TIME_SEC'] = df['LAP_TIME'].apply(time_to_seconds)
-
-    # Parse ELAPSED into timedelta (optional, for consistency checks)
-    df['ELAPSED_TD'] = pd.to_timedelta(df['ELAPSED'], errors='coerce')
+    # assign() only materialises the added columns instead of copying the
+    # whole frame up front
+    df = df.assign(
+        # Parse HOUR into absolute datetime per car with rollover
+        HOUR_DT=parse_hour_with_date_and_rollover(df, race_start_date),
+        # Convert LAP_TIME to seconds
+        LAP_TIME_SEC=times_to_seconds(df['LAP_TIME']),
+    )
 
     # Select race class
     selected_class = st.selectbox("Select class:", sorted(df['CLASS'].dropna().unique()))
@@ -133,8 +175,7 @@ def get_filtered_race_data(df, race_start_date):
 def show_gap_evolution_chart(filtered_df, team_colors, selected_class, selected_cars):
     st.header("📉 Gap Evolution Chart")
 
-    race_start_date = filtered_df['HOUR_DT'].min().date()
-    race_start_dt = datetime.combine(race_start_date, datetime.min.time())
+    race_start_dt = filtered_df['HOUR_DT'].min().normalize()
 
     # Compute cumulative time in seconds from race start datetime
     filtered_df['CUM_TIME_SEC'] = (filtered_df['HOUR_DT'] - race_start_dt).dt.total_seconds()
@@ -143,29 +184,38 @@ def show_gap_evolution_chart(filtered_df, team_colors, selected_class, selected_
     final_times = filtered_df.groupby('NUMBER')['CUM_TIME_SEC'].max()
     fastest_car = final_times.idxmin()
 
-    # Reference cumulative times of fastest car by lap
-    ref_df = filtered_df[filtered_df['NUMBER'] == fastest_car][['LAP_NUMBER', 'CUM_TIME_SEC']].rename(
-        columns={'CUM_TIME_SEC': 'FASTEST_CUM_TIME'}
+    # Reference cumulative times of fastest car by lap — a map() gather is
+    # much cheaper than a full merge
+    ref = (
+        filtered_df.loc[filtered_df['NUMBER'] == fastest_car]
+        .drop_duplicates('LAP_NUMBER')
+        .set_index('LAP_NUMBER')['CUM_TIME_SEC']
+    )
+    filtered_df['GAP_TO_FASTEST'] = (
+        filtered_df['CUM_TIME_SEC'] - filtered_df['LAP_NUMBER'].map(ref)
     )
 
-    # Merge to calculate gap to fastest per lap (seconds)
-    merged = filtered_df.merge(ref_df, on='LAP_NUMBER', how='left')
-    merged['GAP_TO_FASTEST'] = merged['CUM_TIME_SEC'] - merged['FASTEST_CUM_TIME']
-
-    # Build Plotly figure
+    # Build Plotly figure — partition by car once instead of a scan per car
     fig = go.Figure()
 
+    car_groups = dict(list(filtered_df.groupby('NUMBER', observed=True, sort=False)))
+
     for car in selected_cars:
-        car_data = merged[merged['NUMBER'] == car]
-        if car_data.empty:
+        car_data = car_groups.get(car)
+        if car_data is None or car_data.empty:
             continue
 
         team_name = car_data['TEAM'].iloc[0] if 'TEAM' in car_data.columns else ''
         color = team_colors.get(team_name, "#AAAAAA")
 
+        xs, ys = downsample_lttb(
+            car_data['LAP_NUMBER'].to_numpy(),
+            car_data['GAP_TO_FASTEST'].to_numpy(),
+        )
+
         fig.add_trace(go.Scatter(
-            x=car_data['LAP_NUMBER'],
-            y=car_data['GAP_TO_FASTEST'],
+            x=xs,
+            y=ys,
             mode='lines+markers',
             name=f"{car} – {team_name}",
             line=dict(width=2, color=color),
@@ -194,25 +244,31 @@ def show_gap_evolution_chart(filtered_df, team_colors, selected_class, selected_
 def show_cumulative_time_chart(filtered_df, team_colors, selected_class, selected_cars):
     st.header("⏱️ Cumulative Time Chart")
 
-    race_start_date = filtered_df['HOUR_DT'].min().date()
-    race_start_dt = datetime.combine(race_start_date, datetime.min.time())
+    race_start_dt = filtered_df['HOUR_DT'].min().normalize()
 
     # Compute cumulative time in seconds from race start datetime
     filtered_df['CUM_TIME_SEC'] = (filtered_df['HOUR_DT'] - race_start_dt).dt.total_seconds()
 
     fig = go.Figure()
 
+    car_groups = dict(list(filtered_df.groupby('NUMBER', observed=True, sort=False)))
+
     for car in selected_cars:
-        car_data = filtered_df[filtered_df['NUMBER'] == car]
-        if car_data.empty:
+        car_data = car_groups.get(car)
+        if car_data is None or car_data.empty:
             continue
 
         team_name = car_data['TEAM'].iloc[0] if 'TEAM' in car_data.columns else ''
         color = team_colors.get(team_name, "#AAAAAA")
 
+        xs, ys = downsample_lttb(
+            car_data['LAP_NUMBER'].to_numpy(),
+            car_data['CUM_TIME_SEC'].to_numpy(),
+        )
+
         fig.add_trace(go.Scatter(
-            x=car_data['LAP_NUMBER'],
-            y=car_data['CUM_TIME_SEC'],
+            x=xs,
+            y=ys,
             mode='lines+markers',
             name=f"{car} – {team_name}",
             line=dict(width=2, color=color),
@@ -2,6 +2,8 @@ import plotly.graph_objects as go
 import pandas as pd
 import streamlit as st
 
+# Fragment: widget interactions rerun only this chart, not the whole page
+@st.fragment
 def show_lap_position_chart(df, team_colors):
     # --- Independent Class selector ---
     available_classes = sorted(df['CLASS'].dropna().unique())
@@ -18,11 +20,17 @@ def show_lap_position_chart(df, team_colors):
 
     tabs = st.tabs(selected_classes)
 
+    # Partition by class once instead of filtering per tab
+    class_groups = {
+        cls: class_df
+        for cls, class_df in df.groupby('CLASS', observed=True, sort=False)
+    }
+
     for tab, cls in zip(tabs, selected_classes):
         with tab:
             st.markdown(f"### {cls}")
 
-            class_df = df[df['CLASS'] == cls]
+            class_df = class_groups[cls]
 
             # --- Independent Car selector for this class ---
             available_cars = sorted(class_df['NUMBER'].unique())
@@ -48,55 +56,50 @@ def show_lap_position_chart(df, team_colors):
 
             start_lap, end_lap = lap_range
 
-            # Prepare lap positions dict for selected range
-            # Max position for any lap in range:
-            max_position = class_df[class_df['LAP_NUMBER'].between(start_lap, end_lap)]\
-                .groupby("LAP_NUMBER")["NUMBER"].nunique().max()
-
-            lap_positions = {f'Lap {i}': [None] * max_position for i in range(start_lap, end_lap + 1)}
-
-            for lap in range(start_lap, end_lap + 1):
-                lap_df = class_df[class_df['LAP_NUMBER'] == lap].sort_values("ELAPSED").reset_index(drop=True)
-                unique_cars_in_lap = lap_df["NUMBER"].unique()
-                for pos, car_number in enumerate(unique_cars_in_lap, start=1):
-                    if pos - 1 < max_position:
-                        lap_positions[f'Lap {lap}'][pos - 1] = car_number
-
-            position_df = pd.DataFrame(lap_positions)
-            position_df.index.name = 'Position'
-            position_df.index = position_df.index + 1
-
-            # Map colors for cars based on their team
-            car_colors = {}
-            for team, color in team_colors.items():
-                cars_in_team = class_df[class_df["TEAM"].str.lower() == team.lower()]["NUMBER"].unique()
-                for car in cars_in_team:
-                    car_colors[car] = color
-
-            # Fallback color for cars without a team color
-            for car in position_df.values.flatten():
-                if car and car not in car_colors:
-                    car_colors[car] = "#888888"
+            # One sort + groupby instead of a scan per lap: rank cars by
+            # ELAPSED within each lap
+            ranked = (
+                class_df[class_df['LAP_NUMBER'].between(start_lap, end_lap)]
+                .sort_values(["LAP_NUMBER", "ELAPSED"])
+                .drop_duplicates(subset=["LAP_NUMBER", "NUMBER"])
+            )
+            ranked = ranked.assign(POS=ranked.groupby("LAP_NUMBER").cumcount() + 1)
+
+            # Pivot to position of each car per lap, for O(1) trace builds
+            car_pos_matrix = ranked.pivot(index="NUMBER", columns="LAP_NUMBER", values="POS")
+            car_pos_matrix = car_pos_matrix.reindex(columns=range(start_lap, end_lap + 1))
+
+            # Map colors for cars via a single car → team pass instead of
+            # scanning the class frame once per team
+            car_team = (
+                class_df.drop_duplicates("NUMBER")
+                .set_index("NUMBER")["TEAM_LOWER" if "TEAM_LOWER" in class_df.columns else "TEAM"]
+                .astype(str)
+                .str.lower()
+            )
+            colors_by_team = {team.lower(): color for team, color in team_colors.items()}
+            car_colors = {
+                car: colors_by_team.get(team, "#888888")
+                for car, team in car_team.items()
+            }
 
             fig_lap = go.Figure()
 
+            laps = list(range(start_lap, end_lap + 1))
+            cars_with_positions = set(car_pos_matrix.index)
+
             for car_number in selected_cars:
-                positions = []
-                laps = []
-                for lap in range(start_lap, end_lap + 1):
-                    col = f'Lap {lap}'
-                    if car_number in position_df[col].values:
-                        pos = position_df.index[position_df[col] == car_number][0]
-                        positions.append(pos)
-                        laps.append(lap)
-                    else:
-                        positions.append(None)
-                        laps.append(lap)
-
-                if not any(p is not None for p in positions):
+                if car_number not in cars_with_positions:
                     continue
 
-                fig_lap.add_trace(go.Scatter(
+                car_positions = car_pos_matrix.loc[car_number]
+                if car_positions.isna().all():
+                    continue
+
+                positions = [None if pd.isna(p) else p for p in car_positions]
+
+                # Scattergl renders via WebGL — SVG gets slow past ~30 line traces
+                fig_lap.add_trace(go.Scattergl(
                     x=laps,
                     y=positions,
                     mode='lines+markers',
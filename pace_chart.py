@@ -2,11 +2,13 @@ import plotly.express as px
 import pandas as pd
 import streamlit as st
 
+from race_preprocessing import RACE_DF_HASH_FUNCS
+
 
 # ------------------------------------------------------------------
 # Cached helpers (PURE functions only)
 # ------------------------------------------------------------------
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
 def convert_lap_times(df):
     def lap_to_seconds(x):
         try:
@@ -20,22 +22,21 @@ def convert_lap_times(df):
     return df.dropna(subset=["LAP_TIME_SECONDS"])
 
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
 def filter_top_percent_laps(df, percent):
     if percent >= 100:
         return df
 
     filtered_dfs = []
     for car_number, group in df.groupby("NUMBER"):
-        group_sorted = group.sort_values("LAP_TIME_SECONDS")
-        n_laps = len(group_sorted)
-        n_keep = max(1, int(n_laps * percent / 100))
-        filtered_dfs.append(group_sorted.head(n_keep))
+        n_keep = max(1, int(len(group) * percent / 100))
+        # Partial selection of the fastest laps — no full sort needed
+        filtered_dfs.append(group.nsmallest(n_keep, "LAP_TIME_SECONDS"))
 
     return pd.concat(filtered_dfs, ignore_index=True)
 
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
 def compute_avg_pace(df):
     return (
         df.groupby(["NUMBER", "TEAM", "CLASS"], as_index=False)["LAP_TIME_SECONDS"]
@@ -44,7 +45,7 @@ def compute_avg_pace(df):
     )
 
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
 def assign_team_colors(avg_df, team_colors):
     def get_team_color(team):
         for key, color in team_colors.items():
@@ -54,13 +55,15 @@ def assign_team_colors(avg_df, team_colors):
 
     avg_df = avg_df.copy()
     avg_df["color"] = avg_df["TEAM"].apply(get_team_color)
-    avg_df["Label"] = avg_df["NUMBER"] + " — " + avg_df["TEAM"]
+    avg_df["Label"] = avg_df["NUMBER"].astype(str) + " — " + avg_df["TEAM"].astype(str)
     return avg_df
 
 
 # ------------------------------------------------------------------
 # Main chart function
 # ------------------------------------------------------------------
+# Fragment: widget interactions rerun only this chart, not the whole page
+@st.fragment
 def show_pace_chart(df, team_colors):
     st.subheader("Average Race Pace by Car")
 
@@ -58,10 +58,8 @@ def show_practice_fastest_runs(df, team_colors):
     def filter_top_percent_laps(df, percent):
         filtered_dfs = []
         for car_number, group in df.groupby("NUMBER"):
-            group_sorted = group.sort_values("LAP_TIME_SECONDS")
-            n_laps = len(group_sorted)
-            n_keep = max(1, int(n_laps * percent / 100))
-            filtered_dfs.append(group_sorted.head(n_keep))
+            n_keep = max(1, int(len(group) * percent / 100))
+            filtered_dfs.append(group.nsmallest(n_keep, "LAP_TIME_SECONDS"))
         return pd.concat(filtered_dfs)
 
     filtered_df = filter_top_percent_laps(filtered_df, top_percent)
@@ -1,7 +1,28 @@
+import hashlib
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-@st.cache_data(show_spinner="Preprocessing race data…")
+
+def hash_race_df(df: pd.DataFrame) -> str:
+    """
+    Stable fingerprint of a race DataFrame for @st.cache_data keys —
+    hashing the raw column values is far cheaper than Streamlit's default
+    pickle-based hash. Computed fresh per call: pandas propagates attrs to
+    derived frames, so memoizing there would hand filtered slices their
+    ancestor's fingerprint and serve stale cache entries.
+    """
+    return hashlib.md5(
+        pd.util.hash_pandas_object(df, index=False).values.tobytes()
+    ).hexdigest()
+
+
+# Shared hash_funcs for cached helpers that take a race DataFrame
+RACE_DF_HASH_FUNCS = {pd.DataFrame: hash_race_df}
+
+
+@st.cache_data(show_spinner="Preprocessing race data…", hash_funcs=RACE_DF_HASH_FUNCS)
 def preprocess_race(df, drop_invalid_lap_time=True):
     """
     Minimal, shared preprocessing:
@@ -10,16 +31,16 @@ def preprocess_race(df, drop_invalid_lap_time=True):
     - Return a clean dataframe for reuse
     """
 
-    df = df.copy()
+    # Vectorized mm:ss.sss → seconds; invalid rows become NaN
+    parts = df["LAP_TIME"].astype(str).str.split(":", n=1, expand=True)
+    if parts.shape[1] < 2:
+        parts[1] = None
 
-    def lap_to_seconds(x):
-        try:
-            mins, secs = x.split(":")
-            return int(mins) * 60 + float(secs)
-        except Exception:
-            return None
-
-    df["LAP_TIME_SECONDS"] = df["LAP_TIME"].apply(lap_to_seconds)
+    # assign() returns a new frame, so the caller's df is never mutated
+    df = df.assign(
+        LAP_TIME_SECONDS=pd.to_numeric(parts[0], errors="coerce") * 60
+        + pd.to_numeric(parts[1], errors="coerce")
+    )
 
     if drop_invalid_lap_time:
         df = df.dropna(subset=["LAP_TIME_SECONDS"])
@@ -27,43 +48,70 @@ def preprocess_race(df, drop_invalid_lap_time=True):
     return df
 
 
-@st.cache_data(show_spinner="Preprocessing lap position data…")
+def get_race_arrays(df):
+    """
+    Typed NumPy arrays of the hot columns of a preprocessed race frame,
+    built once per race and stashed in st.session_state. String columns
+    are stored as categorical codes so downstream filters are integer
+    compares instead of object-dtype equality.
+    """
+    key = f"race_arrays_{hash_race_df(df)}"
+    arrays = st.session_state.get(key)
+
+    if arrays is None:
+        arrays = {"LAP_TIME_SECONDS": df["LAP_TIME_SECONDS"].to_numpy(dtype=np.float64)}
+        for col in ("DRIVER_NAME", "CLASS", "TEAM", "NUMBER"):
+            if col not in df.columns:
+                continue
+            cat = df[col].astype("category")
+            arrays[f"{col}_codes"] = cat.cat.codes.to_numpy()
+            arrays[f"{col}_categories"] = cat.cat.categories
+        st.session_state[key] = arrays
+
+    return arrays
+
+
+@st.cache_data(show_spinner="Preprocessing lap position data…", hash_funcs=RACE_DF_HASH_FUNCS)
 def preprocess_lap_position_data(df):
     """
     Preprocess lap position data for each class:
     - Prepare position DataFrame per class
     - Prepare car_colors dict per class (empty placeholder, colors assigned later)
     - Calculate max lap per class
-    Returns dict keyed by class: (position_df, car_colors, max_lap)
+    - List available cars per class (so renderers never re-scan the grid)
+    Returns dict keyed by class: (position_df, car_colors, max_lap, available_cars)
     """
 
     result = {}
 
-    available_classes = df['CLASS'].dropna().unique()
-
-    for cls in available_classes:
-        class_df = df[df['CLASS'] == cls]
+    # Partition by class in a single pass instead of one scan per class
+    grouped = df.dropna(subset=['CLASS']).groupby('CLASS', observed=True, sort=False)
 
+    for cls, class_df in grouped:
         max_lap = class_df["LAP_NUMBER"].max()
         if pd.isna(max_lap) or max_lap < 1:
             continue
 
-        lap_positions = {f'Lap {i}': [None] * class_df['NUMBER'].nunique() for i in range(1, int(max_lap) + 1)}
-
-        for lap in range(1, int(max_lap) + 1):
-            lap_df = class_df[class_df['LAP_NUMBER'] == lap].sort_values("ELAPSED").reset_index(drop=True)
-            unique_cars_in_lap = lap_df["NUMBER"].unique()
-            for pos, car_number in enumerate(unique_cars_in_lap, start=1):
-                if pos - 1 < len(lap_positions[f'Lap {lap}']):
-                    lap_positions[f'Lap {lap}'][pos - 1] = car_number
-
-        position_df = pd.DataFrame(lap_positions)
+        # One sort + groupby instead of a scan per lap: rank cars by ELAPSED
+        # within each lap, then pivot into the lap × position grid
+        ranked = (
+            class_df.sort_values(["LAP_NUMBER", "ELAPSED"])
+            .drop_duplicates(subset=["LAP_NUMBER", "NUMBER"])
+        )
+        ranked = ranked.assign(POS=ranked.groupby("LAP_NUMBER").cumcount() + 1)
+
+        position_df = ranked.pivot(index="POS", columns="LAP_NUMBER", values="NUMBER")
+        position_df = position_df.reindex(columns=range(1, int(max_lap) + 1))
+        position_df.columns = [f"Lap {c}" for c in position_df.columns]
+        position_df = position_df.where(position_df.notna(), None).reset_index(drop=True)
         position_df.index.name = 'Position'
         position_df.index = position_df.index + 1
 
         # Placeholder empty car_colors dict - will assign actual colors later
         car_colors = {}
 
-        result[cls] = (position_df, car_colors, max_lap)
+        available_cars = sorted(class_df["NUMBER"].dropna().unique().tolist())
+
+        result[cls] = (position_df, car_colors, max_lap, available_cars)
 
     return result
@@ -1,6 +1,6 @@
 import pandas as pd
 import streamlit as st
-from race_preprocessing import preprocess_race
+from race_preprocessing import preprocess_race, RACE_DF_HASH_FUNCS
 
 def to_seconds(t):
     if pd.isna(t):
@@ -18,7 +18,7 @@ def to_seconds(t):
         return None
     return None
 
-@st.cache_data(show_spinner="Preprocessing results table data…")
+@st.cache_data(show_spinner="Preprocessing results table data…", hash_funcs=RACE_DF_HASH_FUNCS)
 def preprocess_results_table(df, selected_class):
     """
     Preprocess the race dataframe for the results table with class filtering,
@@ -1,9 +1,9 @@
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-from race_preprocessing import preprocess_race  # <-- import shared preprocessing
+from race_preprocessing import preprocess_race, RACE_DF_HASH_FUNCS  # <-- import shared preprocessing
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
 def compute_stint_aggregates(filtered_df, team_colors, cls):
     stint_data = []
 
@@ -60,6 +60,8 @@ def compute_stint_aggregates(filtered_df, team_colors, cls):
     return stint_df_final
 
 
+# Fragment: widget interactions rerun only this chart, not the whole page
+@st.fragment
 def show_stint_pace_chart(df, team_colors):
     if df.empty:
         st.warning("No data available.")
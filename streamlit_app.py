@@ -1,112 +1,226 @@
 import os
 import re
+import types
+from collections import defaultdict
 import pandas as pd
 import streamlit as st
 from datetime import datetime
+from functools import lru_cache
 
-from race_preprocessing import preprocess_race
-from pace_chart import show_pace_chart
-from lap_position_chart import show_lap_position_chart
-from driver_pace_chart import show_driver_pace_chart
-from driver_pace_comparison_chart import show_driver_pace_comparison
-from team_driver_pace_comparison import show_team_driver_pace_comparison
-from results_table import show_results_table
-from gap_evolution_chart import ( 
-    show_gap_evolution_chart, 
-    show_cumulative_time_chart, 
-    get_filtered_race_data )
-from stint_pace_chart import show_stint_pace_chart
-from team_season_comparison import show_team_season_comparison
-from track_analysis import show_track_analysis
-from practice_analysis import show_practice_analysis
-from race_stats import show_race_stats
-from race_tyre_analysis import show_tyre_analysis
+# Chart modules are imported lazily inside their page branch below — each run
+# only pays the import cost of the page it renders (sys.modules makes repeat
+# visits free)
+from race_preprocessing import preprocess_race, RACE_DF_HASH_FUNCS
 
 DATA_DIR = "data"
 
+# Sidebar options as module-level tuples: same object every rerun, so
+# Streamlit's widget hashing never re-walks a fresh list
+_SERIES_OPTIONS = ("IMSA", "FIA WEC")
+_PAGE_OPTIONS = (
+    "Overview",
+    "Team by team",
+    "Team season comparison",
+    "Track analysis",
+    "Practice / Test analysis",
+)
+
+# Pages that need the main race CSV loaded — O(1) membership test, and new
+# pages opt in here instead of amending a string comparison
+_PAGES_NEEDING_RACE_CSV = frozenset({
+    "Overview",
+    "Team by team",
+    "Team season comparison",
+    "Track analysis",
+})
+
+# Columns actually consumed by the charts — everything else is dropped inside
+# the C parser instead of being materialized and carried through the caches
+RACE_COLUMNS = frozenset({
+    "NUMBER",
+    "DRIVER_NAME",
+    "LAP_NUMBER",
+    "LAP_TIME",
+    "CLASS",
+    "TEAM",
+    "MANUFACTURER",
+    "ELAPSED",
+    "HOUR",
+    "CROSSING_FINISH_LINE_IN_PIT",
+    "FLAG_AT_FL",
+})
+
+def split_session_stem(stem):
+    """
+    Split a filename stem like "daytona_practice2" into its event base name,
+    or return None when the stem doesn't name a practice/session file.
+    Plain string ops — no regex engine per file.
+    """
+    head, _, tail = stem.rpartition("_")
+    if not head:
+        return None
+
+    tail = tail.lower()
+    for kind in ("practice", "session"):
+        if tail.startswith(kind) and tail[len(kind):].isdigit():
+            return head
+
+    return None
+
+
 # ------------------------------------------------------------------
-# Regex helpers
+# Team colours (module-level, built once; read-only so chart code
+# cannot mutate the shared instance)
 # ------------------------------------------------------------------
-RACE_CSV_RE = re.compile(r"^(.+)\.csv$", re.IGNORECASE)
-SESSION_CSV_RE = re.compile(r"^(.+?)_(practice|session)(\d+)\.csv$", re.IGNORECASE)
+_TEAM_COLORS = {
+    'Cadillac Hertz Team JOTA': '#d4af37',
+    'Peugeot TotalEnergies': '#BBD64D',
+    'Ferrari AF Corse': '#d62728',
+    'Toyota Gazoo Racing': '#000000',
+    'BMW M Team WRT': '#2426a8',
+    'Porsche Penske Motorsport': '#ffffff',
+    'Alpine Endurance Team': '#2673e2',
+    'Aston Martin Thor Team': '#01655c',
+    'AF Corse': '#FCE903',
+    'Proton Competition': '#fcfcff',
+    'WRT': '#2426a8',
+    'United Autosports': '#FF8000',
+    'Akkodis ASP': '#ff443b',
+    'Iron Dames': '#e5017d',
+    'Manthey': '#0192cf',
+    'Heart of Racing': '#242c3f',
+    'Racing Spirit of Leman': '#428ca8',
+    'Iron Lynx': '#fefe00',
+    'TF Sport': '#eaaa1d',
+    'Cadillac Wayne Taylor Racing': '#0E3463',
+    'JDC-Miller MotorSports': '#F8D94A',
+    'Acura Meyer Shank Racing w/Curb Agajanian': '#E6662C',
+    'Cadillac Whelen': '#D53C35',
+}
+
+TEAM_COLORS = types.MappingProxyType(_TEAM_COLORS)
 
 
 # ------------------------------------------------------------------
 # Cached helpers
 # ------------------------------------------------------------------
 def get_event_names(series_path):
-    events = {}
-    for f in os.listdir(series_path):
-        if not f.lower().endswith(".csv"):
-            continue
+    # defaultdict avoids setdefault's eagerly-built throwaway dicts
+    events = defaultdict(lambda: {"race_file": None, "sessions": []})
+    # scandir reuses the DirEntry metadata from the directory read, so the
+    # is_file check costs no extra stat call
+    with os.scandir(series_path) as entries:
+        for entry in entries:
+            f = entry.name
+            if not f.lower().endswith(".csv") or not entry.is_file(follow_symlinks=False):
+                continue
 
-        race_match = RACE_CSV_RE.match(f)
-        session_match = SESSION_CSV_RE.match(f)
+            # Plain slice beats a regex just to strip the suffix
+            stem = f[:-4]
+            session_base = split_session_stem(stem)
 
-        if session_match:
-            base_name = session_match.group(1).lower()
-            event = events.setdefault(base_name, {"race_file": None, "sessions": []})
-            event["sessions"].append(f)
+            if session_base is not None:
+                events[session_base.lower()]["sessions"].append(f)
+            else:
+                events[stem.lower()]["race_file"] = f
 
-        elif race_match:
-            base_name = race_match.group(1).lower()
-            event = events.setdefault(base_name, {"race_file": None, "sessions": []})
-            event["race_file"] = f
+    # Plain dict so st.cache_data can pickle the result
+    return dict(events)
 
-    return events
+
+@st.cache_data(show_spinner=False)
+def _scan_series(series_path, mtime_ns):
+    # mtime_ns is part of the cache key: unchanged directories short-circuit,
+    # only series with new/changed files get rescanned
+    return get_event_names(series_path)
 
 
 @st.cache_data(show_spinner=False)
 def load_race_file_index(data_dir):
     race_files = {}
 
-    for year in sorted(os.listdir(data_dir)):
-        year_path = os.path.join(data_dir, year)
-        if not os.path.isdir(year_path):
-            continue
+    # scandir's DirEntry carries the dir/stat metadata from the directory
+    # read, so the is_dir/mtime checks need no extra stat syscalls. No sort
+    # here: the sidebar sorts (and caches) what it displays
+    with os.scandir(data_dir) as it:
+        year_entries = [e for e in it if e.is_dir()]
 
+    for year_entry in year_entries:
         series_dict = {}
 
-        for series in sorted(os.listdir(year_path)):
-            series_path = os.path.join(year_path, series)
-            if not os.path.isdir(series_path):
-                continue
+        with os.scandir(year_entry.path) as it:
+            series_entries = [e for e in it if e.is_dir()]
 
-            events = get_event_names(series_path)
+        for series_entry in series_entries:
+            events = _scan_series(series_entry.path, series_entry.stat().st_mtime_ns)
             if events:
-                series_dict[series] = events
+                series_dict[series_entry.name] = events
 
         if series_dict:
-            race_files[year] = series_dict
+            race_files[year_entry.name] = series_dict
 
     return race_files
 
 
+def event_display_name(event_key, event_data):
+    if event_data["race_file"] is None and event_data["sessions"]:
+        return f"{event_key.capitalize()} (Test Sessions)"
+    return event_key.capitalize()
+
+
+@st.cache_data(show_spinner=False)
+def get_sorted_years(data_dir):
+    return sorted(load_race_file_index(data_dir).keys(), reverse=True)
+
+
+@st.cache_data(show_spinner=False)
+def get_event_options(data_dir, year, series):
+    # Sidebar option lists are stable per (year, series) — no need to
+    # re-sort and re-format them on every widget interaction
+    events = load_race_file_index(data_dir)[year][series]
+    event_keys = sorted(events.keys())
+    display_names = [event_display_name(k, events[k]) for k in event_keys]
+    return event_keys, display_names
+
+
 @st.cache_data(show_spinner="Loading race data…")
 def load_race_data(file_path, year, series):
-    df = pd.read_csv(file_path, delimiter=";")
+    # utf-8-sig lets the C parser consume the BOM, so no column ever comes
+    # back with a \ufeff prefix; usecols only has to strip stray spaces
+    df = pd.read_csv(
+        file_path,
+        delimiter=";",
+        encoding="utf-8-sig",
+        usecols=lambda c: c.strip() in RACE_COLUMNS,
+    )
     df.columns = df.columns.str.strip()
 
-    if "\ufeffNUMBER" in df.columns:
-        df.rename(columns={"\ufeffNUMBER": "NUMBER"}, inplace=True)
-
     df["YEAR"] = year
     df["SERIES"] = series
 
-    df["NUMBER"] = df["NUMBER"].astype(str).str.strip()
-    df["TEAM"] = df["TEAM"].astype(str).str.strip()
+    # Plain list-comp strip skips pandas' per-cell str-accessor dispatch
+    df["NUMBER"] = [s.strip() for s in df["NUMBER"].astype(str).to_numpy()]
+    df["TEAM"] = [s.strip() for s in df["TEAM"].astype(str).to_numpy()]
 
-    df["CAR_ID"] = (
-        df["YEAR"].astype(str) + "_" +
-        df["SERIES"].astype(str) + "_" +
-        df["TEAM"] + "_" +
-        df["NUMBER"]
-    )
+    # YEAR/SERIES are scalar for the whole file — one f-string prefix instead
+    # of two astype(str) passes and the extra column-wise concats
+    prefix = f"{year}_{series}_"
+    df["CAR_ID"] = prefix + df["TEAM"] + "_" + df["NUMBER"]
+
+    # Lowercased once here so chart code never calls str.lower() per team
+    df["TEAM_LOWER"] = df["TEAM"].str.lower()
+
+    # Category dtype: integer compares instead of object-dtype equality in
+    # the many per-class/per-car filters downstream
+    for col in ("DRIVER_NAME", "CLASS", "TEAM", "TEAM_LOWER", "NUMBER", "YEAR", "SERIES"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
 
     return df
 
 
-@st.cache_data(show_spinner=False)
+# lru_cache: the Streamlit cache machinery costs more than this tiny parse
+@lru_cache(maxsize=4096)
 def parse_race_start_date(filename):
     date_match = re.search(r"_(\d{8})", filename)
     if not date_match:
@@ -118,8 +232,35 @@ def parse_race_start_date(filename):
 
 
 @st.cache_data(show_spinner=False)
+def get_debug_cars(file_path, year, series):
+    # Dedupe+sort once per file (cached, keyed on the path — stashing this
+    # in df.attrs would propagate it into every derived frame) instead of
+    # on every rerun of the debug expander
+    df = load_race_data(file_path, year, series)
+    return (
+        df[["CAR_ID", "NUMBER", "TEAM", "CLASS"]]
+        .drop_duplicates()
+        .sort_values(["CLASS", "TEAM", "NUMBER"])
+        .reset_index(drop=True)
+    )
+
+
+@st.cache_data(show_spinner=False)
+def get_preprocessed_race(file_path, year, series):
+    # Keyed on the file path, so reruns skip even the DataFrame fingerprint
+    # hash that preprocess_race's own cache would have to compute
+    return preprocess_race(load_race_data(file_path, year, series))
+
+
+@st.cache_data(show_spinner=False, hash_funcs=RACE_DF_HASH_FUNCS)
+def get_class_indices(df):
+    # One groupby over CLASS; every class lookup afterwards is O(1)
+    return df.groupby("CLASS", observed=True).indices
+
+
 def get_class_df(df, race_class):
-    return df[df["CLASS"] == race_class]
+    rows = get_class_indices(df).get(race_class)
+    return df.iloc[rows] if rows is not None else df.iloc[0:0]
 
 
 # ------------------------------------------------------------------
@@ -132,22 +273,13 @@ race_files = load_race_file_index(DATA_DIR)
 # ------------------------------------------------------------------
 st.sidebar.header("Configuration")
 
-selected_series = st.sidebar.selectbox("Series", ["IMSA", "FIA WEC"])
-
-page = st.sidebar.selectbox(
-    "Page",
-    [
-        "Overview",
-        "Team by team",
-        "Team season comparison",
-        "Track analysis",
-        "Practice / Test analysis",
-    ],
-)
+selected_series = st.sidebar.selectbox("Series", _SERIES_OPTIONS)
+
+page = st.sidebar.selectbox("Page", _PAGE_OPTIONS)
 
 selected_year = st.sidebar.selectbox(
     "Year",
-    sorted(race_files.keys(), reverse=True),
+    get_sorted_years(DATA_DIR),
 )
 
 available_series_for_year = race_files[selected_year].keys()
@@ -158,15 +290,7 @@ if selected_series not in available_series_for_year:
 
 events_for_series = race_files[selected_year][selected_series]
 
-
-def event_display_name(event_key, event_data):
-    if event_data["race_file"] is None and event_data["sessions"]:
-        return f"{event_key.capitalize()} (Test Sessions)"
-    return event_key.capitalize()
-
-
-event_keys = sorted(events_for_series.keys())
-display_names = [event_display_name(k, events_for_series[k]) for k in event_keys]
+event_keys, display_names = get_event_options(DATA_DIR, selected_year, selected_series)
 
 selected_event_idx = st.sidebar.selectbox(
     "Race",
@@ -183,7 +307,7 @@ selected_event = events_for_series[selected_event_key]
 df = None
 race_start_date = None
 
-if page != "Practice / Test analysis":
+if page in _PAGES_NEEDING_RACE_CSV:
     if selected_event["race_file"] is None:
         st.error(f"No main race CSV found for {selected_event_key}.")
         st.stop()
@@ -196,7 +320,7 @@ if page != "Practice / Test analysis":
     )
 
     df = load_race_data(file_path, selected_year, selected_series)
-    df_pre = preprocess_race(df)  # ← NEW (cached, shared)
+    df_pre = get_preprocessed_race(file_path, selected_year, selected_series)
     race_start_date = parse_race_start_date(selected_event["race_file"])
 
 # ------------------------------------------------------------------
@@ -204,39 +328,25 @@ if page != "Practice / Test analysis":
 # ------------------------------------------------------------------
 st.header(f"{selected_year} {selected_series} – {selected_event_key.capitalize()} Analysis")
 
-# ------------------------------------------------------------------
-# Team colours
-# ------------------------------------------------------------------
-team_colors = {
-    'Cadillac Hertz Team JOTA': '#d4af37',
-    'Peugeot TotalEnergies': '#BBD64D',
-    'Ferrari AF Corse': '#d62728',
-    'Toyota Gazoo Racing': '#000000',
-    'BMW M Team WRT': '#2426a8',
-    'Porsche Penske Motorsport': '#ffffff',
-    'Alpine Endurance Team': '#2673e2',
-    'Aston Martin Thor Team': '#01655c',
-    'AF Corse': '#FCE903',
-    'Proton Competition': '#fcfcff',
-    'WRT': '#2426a8',
-    'United Autosports': '#FF8000',
-    'Akkodis ASP': '#ff443b',
-    'Iron Dames': '#e5017d',
-    'Manthey': '#0192cf',
-    'Heart of Racing': '#242c3f',
-    'Racing Spirit of Leman': '#428ca8',
-    'Iron Lynx': '#fefe00',
-    'TF Sport': '#eaaa1d',
-    'Cadillac Wayne Taylor Racing': '#0E3463',
-    'JDC-Miller MotorSports': '#F8D94A',
-    'Acura Meyer Shank Racing w/Curb Agajanian': '#E6662C',
-    'Cadillac Whelen': '#D53C35',
-}
+team_colors = TEAM_COLORS
 
 # ------------------------------------------------------------------
 # Pages
 # ------------------------------------------------------------------
 if page == "Overview":
+    from pace_chart import show_pace_chart
+    from lap_position_chart import show_lap_position_chart
+    from driver_pace_chart import show_driver_pace_chart
+    from driver_pace_comparison_chart import show_driver_pace_comparison
+    from results_table import show_results_table
+    from gap_evolution_chart import (
+        show_gap_evolution_chart,
+        show_cumulative_time_chart,
+        get_filtered_race_data )
+    from stint_pace_chart import show_stint_pace_chart
+    from race_stats import show_race_stats
+    from race_tyre_analysis import show_tyre_analysis
+
     if race_start_date is None:
         st.error("Race start date not found or invalid.")
         st.stop()
@@ -254,17 +364,24 @@ if page == "Overview":
         show_driver_pace_comparison(df, team_colors)
 
     with gap_tab:
-        filtered_df, selected_class, selected_cars, lap_range = get_filtered_race_data(df, race_start_date)
+        # Fragment: the shared class/car/lap widgets rerun only this tab
+        @st.fragment
+        def render_gap_tab():
+            filtered_df, selected_class, selected_cars, lap_range = get_filtered_race_data(df, race_start_date)
+
+            if filtered_df is not None:
+                show_gap_evolution_chart(filtered_df, team_colors, selected_class, selected_cars)
+                show_cumulative_time_chart(filtered_df, team_colors, selected_class, selected_cars)
+                show_stint_pace_chart(df, team_colors)
 
-        if filtered_df is not None:
-            show_gap_evolution_chart(filtered_df, team_colors, selected_class, selected_cars)
-            show_cumulative_time_chart(filtered_df, team_colors, selected_class, selected_cars)
-            show_stint_pace_chart(df, team_colors)
+        render_gap_tab()
 
     with pits_tab:
         show_tyre_analysis()
 
 elif page == "Team by team":
+    from team_driver_pace_comparison import show_team_driver_pace_comparison
+
     race_classes = sorted(df["CLASS"].dropna().unique())
     tabs = st.tabs(race_classes)
 
@@ -275,12 +392,18 @@ elif page == "Team by team":
                 show_team_driver_pace_comparison(class_df, team_colors)
 
 elif page == "Team season comparison":
+    from team_season_comparison import show_team_season_comparison
+
     show_team_season_comparison(df, team_colors)
 
 elif page == "Track analysis":
+    from track_analysis import show_track_analysis
+
     show_track_analysis(df, team_colors)
 
 elif page == "Practice / Test analysis":
+    from practice_analysis import show_practice_analysis
+
     show_practice_analysis(
         data_dir=DATA_DIR,
         year=selected_year,
@@ -292,13 +415,7 @@ elif page == "Practice / Test analysis":
 # ------------------------------------------------------------------
 # Debug
 # ------------------------------------------------------------------
-if df is not None:
+if page in _PAGES_NEEDING_RACE_CSV and df is not None:
     with st.expander("Debug: Car IDs"):
-        debug_df = (
-            df[["CAR_ID", "NUMBER", "TEAM", "CLASS"]]
-            .drop_duplicates()
-            .sort_values(["CLASS", "TEAM", "NUMBER"])
-            .reset_index(drop=True)
-        )
-
-        st.dataframe(debug_df, use_container_width=True, hide_index=True)
+        debug_cars = get_debug_cars(file_path, selected_year, selected_series)
+        st.dataframe(debug_cars, use_container_width=True, hide_index=True)